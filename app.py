@@ -1,6 +1,5 @@
 from flask import Flask, request, jsonify, render_template, Response, stream_with_context
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 import queue
 import uuid
@@ -8,10 +7,11 @@ import json
 import time
 
 from recorded import (
-    check_single_court,
-    check_all_courts_parallel,
+    DEFAULT_COMPLEX,
+    DEFAULT_FACILITY,
     daterange,
 )
+from planner import SlotRequest, build_plan, run_plan
 from logger import get_logger
 
 app = Flask(__name__)
@@ -28,6 +28,18 @@ jobs_lock = threading.Lock()
 # Locally with 8GB+, try 4-7.
 MAX_PARALLEL_COURTS = 2
 
+# Each target may start a discovery run and each sub-facility a browser session.
+# The sub-facility cap applies to explicit lists and to discovered ones.
+MAX_TARGETS = 3
+MAX_SUB_FACILITIES_PER_TARGET = 10
+
+# ---- SSE protocol ----
+# Every frame carries the protocol version and a per-stream sequence number.
+# Log lines and result patches queued within one flush interval are
+# coalesced into a single "batch" frame.
+EVENTS_PROTOCOL_VERSION = 2
+EVENTS_FLUSH_INTERVAL = 0.25  # seconds
+
 
 @app.route("/")
 def index():
@@ -56,55 +68,91 @@ def check_slots():
     if (ed - sd).days > 2:
         return jsonify({"error": "Maximum allowed window is 3 days"}), 400
 
+    # Targets: which complex/facility (and optionally sub-facilities) to check
+    targets = data.get("targets") or [{}]
+    if not isinstance(targets, list) or not all(isinstance(t, dict) for t in targets):
+        return jsonify({"error": "targets must be a list of objects"}), 400
+
+    if len(targets) > MAX_TARGETS:
+        return jsonify({"error": f"Maximum allowed targets is {MAX_TARGETS}"}), 400
+
+    slot_requests = []
+    for target in targets:
+        complex_label = target.get("complex") or DEFAULT_COMPLEX
+        facility_label = target.get("facility") or DEFAULT_FACILITY
+        sub_facilities = target.get("sub_facilities") or [None]
+        if not isinstance(complex_label, str) or not isinstance(facility_label, str):
+            return jsonify({"error": "complex and facility must be strings"}), 400
+        if not isinstance(sub_facilities, list) or not all(
+            sub is None or isinstance(sub, str) for sub in sub_facilities
+        ):
+            return jsonify({"error": "sub_facilities must be a list of strings"}), 400
+        if len(sub_facilities) > MAX_SUB_FACILITIES_PER_TARGET:
+            return jsonify(
+                {"error": f"Maximum allowed sub_facilities per target is {MAX_SUB_FACILITIES_PER_TARGET}"}
+            ), 400
+        for date_str in daterange(start_date, end_date):
+            for sub in sub_facilities:
+                slot_requests.append(SlotRequest(complex_label, facility_label, sub, date_str))
+
+    multi_target = len(targets) > 1
+
+    def cell_label(req):
+        sub = req.sub_facility or "All sub-facilities"
+        if multi_target:
+            return f"{req.complex} / {req.facility} / {sub}"
+        return sub
+
     # Create job
     job_id = uuid.uuid4().hex
     q = queue.Queue()
-    job = {"queue": q, "results": {}, "finished": False}
+    # seq/sent live on the job so they survive EventSource reconnects
+    job = {"queue": q, "results": {}, "finished": False, "seq": 0, "sent": {}}
     with jobs_lock:
         jobs[job_id] = job
 
     def run_job():
-        results = {}
-
-        for date_str in daterange(start_date, end_date):
-            results[date_str] = {}
-            q.put({"type": "log", "msg": f"{date_str}: Starting parallel check for 7 courts..."})
-
-            courts = list(range(1, 8))
-
-            def court_worker(court):
-                """Runs in a thread. Returns (court, slots_or_error)."""
-                label = f"Wooden Court {court}"
-                q.put({"type": "log", "msg": f"{date_str} {label}: checking..."})
-                logger.info(f"{date_str} {label}: checking...")
-                try:
-                    slots = check_single_court(court, date_str)
-                    q.put({"type": "log", "msg": f"{date_str} {label}: OK ({len(slots)} slots)"})
-                    q.put({"type": "result_partial", "date": date_str, "court": str(court), "value": slots})
-                    logger.info(f"{date_str} {label}: OK ({len(slots)} slots)")
-                    return (court, slots)
-                except Exception as e:
-                    q.put({"type": "log", "msg": f"{date_str} {label}: ERROR: {type(e).__name__}: {e}"})
-                    q.put({"type": "result_partial", "date": date_str, "court": str(court), "value": "ERROR"})
-                    logger.error(f"{date_str} {label}: ERROR: {type(e).__name__}: {e}")
-                    return (court, "ERROR")
-
-            # Run courts in parallel
-            with ThreadPoolExecutor(max_workers=MAX_PARALLEL_COURTS) as executor:
-                futures = {executor.submit(court_worker, c): c for c in courts}
-                for future in as_completed(futures):
-                    court, result = future.result()
-                    results[date_str][str(court)] = result
-
-            q.put({"type": "log", "msg": f"{date_str}: All courts checked."})
-
-        # Mark done
-        q.put({"type": "done", "results": results})
-        with jobs_lock:
-            job_entry = jobs.get(job_id)
-            if job_entry is not None:
-                job_entry["results"] = results
-                job_entry["finished"] = True
+        results = {date_str: {} for date_str in daterange(start_date, end_date)}
+
+        def on_progress(req, status, data):
+            label = cell_label(req)
+            prefix = f"{req.date} {label}"
+            if status == "queued":
+                q.put({"type": "log", "msg": f"{prefix}: checking..."})
+                q.put({"type": "result_partial", "date": req.date, "court": label, "value": None})
+                logger.info(f"{prefix}: checking...")
+            elif status == "ok":
+                results[req.date][label] = data
+                q.put({"type": "log", "msg": f"{prefix}: OK ({len(data)} slots)"})
+                q.put({"type": "result_partial", "date": req.date, "court": label, "value": data})
+                logger.info(f"{prefix}: OK ({len(data)} slots)")
+            else:
+                results[req.date][label] = "ERROR"
+                q.put({"type": "log", "msg": f"{prefix}: ERROR: {data}"})
+                q.put({"type": "result_partial", "date": req.date, "court": label, "value": "ERROR"})
+                logger.error(f"{prefix}: ERROR: {data}")
+
+        try:
+            plan = build_plan(slot_requests)
+            q.put({"type": "log", "msg": "Planning checks (discovering sub-facilities if needed)..."})
+            run_plan(
+                plan,
+                max_workers=MAX_PARALLEL_COURTS,
+                max_sub_facilities=MAX_SUB_FACILITIES_PER_TARGET,
+                progress_callback=on_progress,
+            )
+            q.put({"type": "log", "msg": "All checks finished."})
+        except Exception as e:
+            q.put({"type": "log", "msg": f"Job failed: {type(e).__name__}: {e}"})
+            logger.exception(f"job {job_id} failed")
+        finally:
+            # Mark done, with whatever results exist
+            q.put({"type": "done", "results": results})
+            with jobs_lock:
+                job_entry = jobs.get(job_id)
+                if job_entry is not None:
+                    job_entry["results"] = results
+                    job_entry["finished"] = True
 
     thread = threading.Thread(target=run_job, daemon=True)
     thread.start()
@@ -112,6 +160,43 @@ def check_slots():
     return jsonify({"job_id": job_id})
 
 
+def build_frames(items, sent):
+    """Coalesce queued job items into SSE frames.
+
+    Log lines are batched in order. Result partials become per-cell patches;
+    only the latest value per (date, court) is kept, and cells whose value
+    matches what was already sent for this job are skipped. `sent` is
+    updated in place. A "done" item always ends the frame list and carries
+    the full results so the client can reconcile any missed patches.
+    """
+    logs = []
+    patches = {}
+    done = None
+
+    for item in items:
+        kind = item.get("type")
+        if kind == "log":
+            logs.append(item.get("msg"))
+        elif kind == "result_partial":
+            patches[(item["date"], item["court"])] = item["value"]
+        elif kind == "done":
+            done = item
+
+    changed = []
+    for key, value in patches.items():
+        if key in sent and sent[key] == value:
+            continue
+        sent[key] = value
+        changed.append({"date": key[0], "court": key[1], "value": value})
+
+    frames = []
+    if logs or changed:
+        frames.append({"type": "batch", "logs": logs, "patches": changed})
+    if done is not None:
+        frames.append({"type": "done", "results": done.get("results", {})})
+    return frames
+
+
 @app.route('/events/<job_id>')
 def events(job_id):
     def gen():
@@ -125,21 +210,43 @@ def events(job_id):
         while True:
             try:
                 item = q.get(timeout=300)
-            except Exception:
+            except queue.Empty:
                 try:
                     yield 'data: {}\n\n'
                 except GeneratorExit:
                     break
                 continue
 
-            try:
-                payload = json.dumps(item, default=str)
-            except Exception:
-                payload = json.dumps({'type': 'log', 'msg': '<unserializable>'})
+            # Drain whatever else arrives within the flush interval
+            items = [item]
+            deadline = time.monotonic() + EVENTS_FLUSH_INTERVAL
+            while items[-1].get('type') != 'done':
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(q.get(timeout=remaining))
+                except queue.Empty:
+                    break
 
-            yield f"data: {payload}\n\n"
+            with jobs_lock:
+                frames = build_frames(items, job['sent'])
+                seqs = range(job['seq'] + 1, job['seq'] + 1 + len(frames))
+                job['seq'] += len(frames)
 
-            if isinstance(item, dict) and item.get('type') == 'done':
+            for frame, seq in zip(frames, seqs):
+                frame['v'] = EVENTS_PROTOCOL_VERSION
+                frame['seq'] = seq
+                try:
+                    payload = json.dumps(frame, default=str)
+                except Exception:
+                    payload = json.dumps({
+                        'v': EVENTS_PROTOCOL_VERSION, 'seq': seq, 'type': 'batch',
+                        'logs': ['<unserializable>'], 'patches': [],
+                    })
+                yield f"data: {payload}\n\n"
+
+            if frames and frames[-1]['type'] == 'done':
                 break
 
     return Response(stream_with_context(gen()), mimetype='text/event-stream')
@@ -0,0 +1,305 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+from recorded import (
+    DEFAULT_COMPLEX,
+    DEFAULT_FACILITY,
+    collect_slots_for_date,
+    daterange,
+    list_sub_facilities,
+    navigate_to_facility_step,
+    run_with_retries,
+    select_sub_facility,
+)
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+# ---------------------------
+# Request model
+# ---------------------------
+
+@dataclass(frozen=True)
+class SlotRequest:
+    """One availability lookup. sub_facility=None means every sub-facility
+    the facility offers (discovered from the site)."""
+    complex: str = DEFAULT_COMPLEX
+    facility: str = DEFAULT_FACILITY
+    sub_facility: str | None = None
+    date: str = ""
+
+
+# ---------------------------
+# Sub-facility discovery cache
+# ---------------------------
+
+# How long a discovered sub-facility list is trusted before re-reading it
+SUB_FACILITY_CACHE_TTL = 6 * 60 * 60  # seconds
+
+# (complex, facility) -> (fetched_at, [sub_facility labels])
+_sub_facility_cache = {}
+_sub_facility_lock = threading.Lock()
+
+
+def get_cached_sub_facilities(complex_label: str, facility_label: str):
+    with _sub_facility_lock:
+        entry = _sub_facility_cache.get((complex_label, facility_label))
+    if entry is None:
+        return None
+    fetched_at, labels = entry
+    if time.monotonic() - fetched_at > SUB_FACILITY_CACHE_TTL:
+        return None
+    return list(labels)
+
+
+def store_sub_facilities(complex_label: str, facility_label: str, labels):
+    with _sub_facility_lock:
+        _sub_facility_cache[(complex_label, facility_label)] = (time.monotonic(), list(labels))
+    logger.info(f"{complex_label} / {facility_label}: discovered {len(labels)} sub-facilities")
+
+
+# ---------------------------
+# Planning
+# ---------------------------
+
+def build_plan(requests):
+    """Group requests into a tree keyed by shared wizard prefix:
+
+        {complex: {facility: {sub_facility: [dates]}}}
+
+    Insertion order follows the first appearance of each key and duplicate
+    requests collapse into one leaf. A None sub_facility is kept as-is and
+    expanded by run_plan once the facility's sub-facilities are known.
+    """
+    plan = {}
+    for req in requests:
+        subs = plan.setdefault(req.complex, {}).setdefault(req.facility, {})
+        dates = subs.setdefault(req.sub_facility, [])
+        if req.date not in dates:
+            dates.append(req.date)
+    return plan
+
+
+def merge_branches(labels, wildcard_dates, explicit, max_sub_facilities=None):
+    """Expand wildcard dates over discovered sub-facilities and merge in the
+    explicit requests, giving one branch per sub-facility.
+
+    Explicit sub-facilities the site did not list keep their own branch.
+    Discovered labels beyond max_sub_facilities are dropped with a warning.
+
+    Returns:
+        list: [(sub_facility, [dates sorted])]
+    """
+    if max_sub_facilities is not None and len(labels) > max_sub_facilities:
+        logger.warning(
+            f"{len(labels)} sub-facilities discovered, checking only the first {max_sub_facilities}"
+        )
+        labels = labels[:max_sub_facilities]
+
+    merged = {sub: set(wildcard_dates) for sub in labels}
+    for sub, dates in explicit.items():
+        merged.setdefault(sub, set()).update(dates)
+    return [(sub, sorted(dates)) for sub, dates in merged.items()]
+
+
+# ---------------------------
+# Execution
+# ---------------------------
+
+def _error_text(e):
+    return f"{type(e).__name__}: {e}"
+
+
+def _check_pending(page, complex_label, facility_label, sub_label, state, report, max_attempts):
+    """On the slots step, check each pending date in place.
+
+    Dates that fail stay pending. Before the final attempt they are retried
+    in a fresh session by raising; on the final attempt each is reported as
+    an error on its own.
+    """
+    failed = []
+    for date_str in state["pending"]:
+        req = SlotRequest(complex_label, facility_label, sub_label, date_str)
+        try:
+            slots = collect_slots_for_date(page, date_str)
+        except Exception as e:
+            logger.warning(f"{sub_label} {date_str} -> {_error_text(e)}")
+            failed.append((req, _error_text(e)))
+            continue
+        report(req, "ok", slots)
+
+    state["pending"] = [req.date for req, _ in failed]
+    if not failed:
+        return
+    if state["attempt"] < max_attempts:
+        raise RuntimeError(f"{len(failed)} date(s) failed, retrying: {failed[0][1]}")
+    for req, error in failed:
+        report(req, "error", error)
+    state["pending"] = []
+
+
+def _run_branch(complex_label, facility_label, sub_label, dates, report, max_attempts):
+    """Check every date of one sub-facility in a single browser session.
+
+    The wizard prefix (complex, facility, sub-facility) runs once per session
+    and dates branch in place on the slots step. A fresh session only
+    retries the dates that have not succeeded yet.
+    """
+    state = {"attempt": 0, "pending": list(dates)}
+
+    def steps(page):
+        state["attempt"] += 1
+        navigate_to_facility_step(page, complex_label, facility_label)
+        select_sub_facility(page, sub_label)
+        _check_pending(page, complex_label, facility_label, sub_label, state, report, max_attempts)
+
+    try:
+        run_with_retries(steps, tag=f"{sub_label}_{dates[0]}", max_attempts=max_attempts)
+    except Exception as e:
+        for date_str in state["pending"]:
+            report(SlotRequest(complex_label, facility_label, sub_label, date_str), "error", _error_text(e))
+
+
+def _run_discovery_branch(
+    complex_label, facility_label, wildcard_dates, explicit, submit, report, max_attempts, max_sub_facilities
+):
+    """Discover a facility's sub-facilities, schedule a branch for each, and
+    continue with the first branch in the same browser session.
+
+    Explicit requests for this facility are scheduled from here too, so a
+    sub-facility never gets two sessions. If discovery fails they still run.
+    """
+    state = {"attempt": 0, "branches": None, "pending": []}
+
+    def steps(page):
+        state["attempt"] += 1
+        navigate_to_facility_step(page, complex_label, facility_label)
+        if state["branches"] is None:
+            labels = list_sub_facilities(page)
+            store_sub_facilities(complex_label, facility_label, labels)
+            branches = merge_branches(labels, wildcard_dates, explicit, max_sub_facilities)
+            state["branches"] = branches
+            for sub, dates in branches[1:]:
+                submit(complex_label, facility_label, sub, dates)
+            if branches:
+                sub, dates = branches[0]
+                state["pending"] = list(dates)
+                for date_str in dates:
+                    report(SlotRequest(complex_label, facility_label, sub, date_str), "queued", None)
+
+        if not state["pending"]:
+            return
+        sub, _ = state["branches"][0]
+        select_sub_facility(page, sub)
+        _check_pending(page, complex_label, facility_label, sub, state, report, max_attempts)
+
+    try:
+        run_with_retries(steps, tag=f"discover_{facility_label}", max_attempts=max_attempts)
+    except Exception as e:
+        if state["branches"] is None:
+            for date_str in wildcard_dates:
+                report(SlotRequest(complex_label, facility_label, None, date_str), "error", _error_text(e))
+            for sub, dates in explicit.items():
+                submit(complex_label, facility_label, sub, dates)
+        else:
+            sub, _ = state["branches"][0]
+            for date_str in state["pending"]:
+                report(SlotRequest(complex_label, facility_label, sub, date_str), "error", _error_text(e))
+
+
+def run_plan(plan, max_workers: int = 3, max_attempts: int = 2, max_sub_facilities=None, progress_callback=None):
+    """Execute a plan from build_plan, one browser session per sub-facility.
+
+    Facilities with a cold sub-facility cache start with a discovery session,
+    which schedules the other branches and then checks the first one itself.
+
+    Args:
+        plan: Tree returned by build_plan
+        max_workers: Max parallel browsers
+        max_sub_facilities: Optional cap on discovered sub-facilities per facility
+        progress_callback: Optional fn(request, status, slots_or_error) with
+            status "queued" (branch scheduled), "ok" or "error"
+
+    Returns:
+        dict: {SlotRequest: slots_list_or_"ERROR"}. sub_facility is resolved,
+        except for wildcard requests whose discovery failed.
+    """
+    results = {}
+    results_lock = threading.Lock()
+
+    def report(req, status, data):
+        if status != "queued":
+            with results_lock:
+                results[req] = data if status == "ok" else "ERROR"
+        if progress_callback:
+            progress_callback(req, status, data)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = []
+        futures_lock = threading.Lock()
+
+        def schedule(fn, *args):
+            with futures_lock:
+                futures.append(executor.submit(fn, *args))
+
+        def submit(complex_label, facility_label, sub, dates):
+            for date_str in dates:
+                report(SlotRequest(complex_label, facility_label, sub, date_str), "queued", None)
+            schedule(_run_branch, complex_label, facility_label, sub, dates, report, max_attempts)
+
+        for complex_label, facilities in plan.items():
+            for facility_label, subs in facilities.items():
+                explicit = {sub: dates for sub, dates in subs.items() if sub is not None}
+                wildcard_dates = subs.get(None)
+
+                if not wildcard_dates:
+                    branches = merge_branches([], [], explicit)
+                else:
+                    labels = get_cached_sub_facilities(complex_label, facility_label)
+                    if labels is None:
+                        schedule(
+                            _run_discovery_branch, complex_label, facility_label,
+                            wildcard_dates, explicit, submit, report, max_attempts, max_sub_facilities,
+                        )
+                        continue
+                    branches = merge_branches(labels, wildcard_dates, explicit, max_sub_facilities)
+
+                for sub, dates in branches:
+                    submit(complex_label, facility_label, sub, dates)
+
+        # Discovery sessions add futures while running; wait until none are left
+        while True:
+            with futures_lock:
+                pending = [f for f in futures if not f.done()]
+            if not pending:
+                break
+            wait(pending, return_when=FIRST_COMPLETED)
+
+        for future in futures:
+            future.result()
+
+    return results
+
+
+# ---------------------------
+# Manual runner
+# ---------------------------
+
+if __name__ == "__main__":
+    START_DATE = "2025-12-19"
+    END_DATE = "2025-12-19"
+
+    def on_progress(req, status, data):
+        label = f"{req.date} {req.sub_facility or 'All sub-facilities'}"
+        if status == "ok":
+            logger.info(f"{label}: {len(data)} slots found")
+            for s in data:
+                logger.info(f"  ✔ {s}")
+        elif status == "error":
+            logger.error(f"{label}: ERROR - {data}")
+
+    plan = build_plan(SlotRequest(date=d) for d in daterange(START_DATE, END_DATE))
+    run_plan(plan, max_workers=3, progress_callback=on_progress)
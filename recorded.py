@@ -1,9 +1,8 @@
 import re
 from datetime import datetime, timedelta
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from playwright.sync_api import Playwright, sync_playwright
+from playwright.sync_api import sync_playwright
 from logger import get_logger
 
 logger = get_logger(__name__)
@@ -158,13 +157,19 @@ def open_select2_by_placeholder_text(page, placeholder_text: str, timeout: int =
     )
 
 
-def select2_choose_option(page, option_text: str, timeout: int = 15000) -> None:
+def exact_text(text: str):
+    """Pattern matching an element's whole text, so "Court 1" never matches "Court 10"."""
+    return re.compile(rf"^\s*{re.escape(text)}\s*$")
+
+
+def select2_choose_option(page, option_text: str, timeout: int = 15000, exact: bool = False) -> None:
     page.wait_for_selector(
         "ul.select2-results__options li.select2-results__option",
         timeout=timeout,
         state="visible",
     )
-    opt = page.locator("li.select2-results__option").filter(has_text=option_text).first
+    has_text = exact_text(option_text) if exact else option_text
+    opt = page.locator("li.select2-results__option").filter(has_text=has_text).first
     if opt.count() == 0:
         raise RuntimeError(f"Select2 option not found: {option_text}")
     safe_click(opt, timeout=timeout, retries=2, label=option_text)
@@ -212,15 +217,19 @@ def block_unnecessary_resources(route, request):
 
 # ---------------------------
 # Navigate to facility step (Steps 0-4)
-# Shared across all courts — this is the common prefix
+# Shared across all sub-facilities — this is the common prefix
 # ---------------------------
 
-def navigate_to_facility_step(page):
-    """Navigate from landing page through Step 4 (Badminton selected).
-    After this, the page is ready for court selection (Step 5).
-    """
-    complex_label = "Shahaji Raje Bhosle Kreeda Sankul, Andheri"
+DEFAULT_COMPLEX = "Shahaji Raje Bhosle Kreeda Sankul, Andheri"
+DEFAULT_FACILITY = "Badminton"
+
+SUB_FACILITY_PLACEHOLDER = "Select your Sports Sub-Facility"
 
+
+def navigate_to_facility_step(page, complex_label: str = DEFAULT_COMPLEX, facility_label: str = DEFAULT_FACILITY):
+    """Navigate from landing page through Step 4 (facility selected).
+    After this, the page is ready for sub-facility selection (Step 5).
+    """
     # STEP 0: Landing
     page.goto(
         "https://reczone.mcgm.gov.in/sports-complex/book-your-sport",
@@ -239,7 +248,7 @@ def navigate_to_facility_step(page):
     open_select2_by_container_id(page, "#select2-reczone-dropdown-container-container")
     wait_visible(page, "input.select2-search__field", label="complex search field")
     page.locator("input.select2-search__field").first.fill(complex_label)
-    select2_choose_option(page, complex_label)
+    select2_choose_option(page, complex_label, exact=True)
 
     safe_click(page.get_by_role("button", name="Next").first, label="After complex Next")
 
@@ -259,42 +268,78 @@ def navigate_to_facility_step(page):
     major_pause(page)
 
     open_select2_by_placeholder_text(page, "Select your Sports Facility")
-    select2_choose_option(page, "Badminton")
+    select2_choose_option(page, facility_label, exact=True)
     major_pause(page)
 
 
 # ---------------------------
-# From facility step, pick court + date and collect slots (Steps 5-6)
+# Sub-facility step (Step 5)
 # ---------------------------
 
-def get_slots_from_facility_step(page, court_no: int, date_str: str):
-    """Starting from facility-selected state, pick court, date, and return slots."""
-    court_label = f"Wooden Court {court_no} | 968 Sq ft"
+def list_sub_facilities(page):
+    """From facility-selected state, return the sub-facility labels on offer.
+    Leaves the dropdown closed so the page can continue to select_sub_facility.
+    """
+    wait_visible(
+        page,
+        f"span.select2-selection__placeholder:has-text('{SUB_FACILITY_PLACEHOLDER}')",
+        label="Sub-facility placeholder",
+    )
+    open_select2_by_placeholder_text(page, SUB_FACILITY_PLACEHOLDER)
 
-    # STEP 5: Court
+    opts = page.locator("li.select2-results__option:not(.select2-results__message)")
+    labels = []
+    for i in range(opts.count()):
+        opt = opts.nth(i)
+        if opt.get_attribute("aria-disabled") == "true":
+            continue
+        text = opt.inner_text().strip()
+        if not text or text.startswith("Select"):
+            continue
+        labels.append(text)
+
+    page.keyboard.press("Escape")
+    mini_pause(page, 250)
+
+    if not labels:
+        raise RuntimeError("No sub-facility options found")
+    return labels
+
+
+def select_sub_facility(page, sub_label: str):
+    """From facility-selected state, pick a sub-facility and move on to the slots step."""
     wait_visible(
         page,
-        "span.select2-selection__placeholder:has-text('Select your Sports Sub-Facility')",
+        f"span.select2-selection__placeholder:has-text('{SUB_FACILITY_PLACEHOLDER}')",
         label="Sub-facility placeholder",
     )
-    open_select2_by_placeholder_text(page, "Select your Sports Sub-Facility")
+    open_select2_by_placeholder_text(page, SUB_FACILITY_PLACEHOLDER)
 
-    opts = page.locator("li.select2-results__option").filter(has_text=court_label)
+    opts = page.locator("li.select2-results__option").filter(has_text=exact_text(sub_label))
 
     if opts.count() == 0:
         page.keyboard.press("Escape")
         page.wait_for_timeout(250)
-        open_select2_by_placeholder_text(page, "Select your Sports Sub-Facility")
-        opts = page.locator("li.select2-results__option").filter(has_text=court_label)
+        open_select2_by_placeholder_text(page, SUB_FACILITY_PLACEHOLDER)
+        opts = page.locator("li.select2-results__option").filter(has_text=exact_text(sub_label))
 
     if opts.count() == 0:
-        raise RuntimeError(f"Court option not found: {court_label}")
+        raise RuntimeError(f"Sub-facility option not found: {sub_label}")
 
-    safe_click(opts.first, label=f"Select court {court_no}")
+    safe_click(opts.first, label=f"Select sub-facility {sub_label}")
     safe_click(page.get_by_role("button", name="Next").first, label="Next to slots")
     major_pause(page)
 
-    # STEP 6: Slots + date
+    wait_visible(page, "div.date-button", label="Slots date buttons")
+
+
+# ---------------------------
+# Slots step (Step 6)
+# Can be called repeatedly on the same page, once per date
+# ---------------------------
+
+def collect_slots_for_date(page, date_str: str):
+    """From the slots step, click the date button and return available slots."""
     wait_visible(page, "div.date-button", label="Slots date buttons")
     target_selector = f"div.date-button[data-active-date='{date_str}']"
     day_btn = page.locator(target_selector).first
@@ -329,15 +374,14 @@ def get_slots_from_facility_step(page, court_no: int, date_str: str):
 
 
 # ---------------------------
-# Single court worker (for parallel execution)
+# Browser session runner
 # ---------------------------
 
-def check_single_court(court_no: int, date_str: str, max_attempts: int = 2):
-    """Self-contained: launches its own Playwright + browser, checks one court.
+def run_with_retries(steps, tag: str, max_attempts: int = 2):
+    """Self-contained: launches its own Playwright + browser and runs
+    steps(page), retrying in a fresh browser on failure.
     Designed to run in a thread.
     """
-    last_error = None
-
     for attempt in range(1, max_attempts + 1):
         browser = context = page = None
         try:
@@ -352,23 +396,16 @@ def check_single_court(court_no: int, date_str: str, max_attempts: int = 2):
                 # Block heavy resources
                 page.route("**/*", block_unnecessary_resources)
 
-                # Navigate Steps 0-4 (common for all courts)
-                navigate_to_facility_step(page)
-
-                # Steps 5-6 (court-specific)
-                slots = get_slots_from_facility_step(page, court_no, date_str)
+                result = steps(page)
 
                 context.close()
                 browser.close()
-                return slots
+                return result
 
         except Exception as e:
-            last_error = e
             if page:
-                dump_debug(page, f"attempt{attempt}_court{court_no}_{date_str}")
-            logger.warning(
-                f"[Attempt {attempt}] court={court_no} date={date_str} -> {type(e).__name__}: {e}"
-            )
+                dump_debug(page, re.sub(r"\W+", "_", f"attempt{attempt}_{tag}"))
+            logger.warning(f"[Attempt {attempt}] {tag} -> {type(e).__name__}: {e}")
             try:
                 if context:
                     context.close()
@@ -381,98 +418,5 @@ def check_single_court(court_no: int, date_str: str, max_attempts: int = 2):
                 pass
 
             if attempt >= max_attempts:
-                logger.error(
-                    f"[FINAL FAIL] court={court_no} date={date_str} -> {type(e).__name__}: {e}",
-                    exc_info=True,
-                )
+                logger.error(f"[FINAL FAIL] {tag} -> {type(e).__name__}: {e}", exc_info=True)
                 raise
-
-    raise last_error
-
-
-# ---------------------------
-# Original function (kept for backward compat)
-# ---------------------------
-
-def get_available_slots_for_court(
-    playwright: Playwright,
-    court_no: int,
-    date_str: str,
-    max_attempts: int = 2,
-):
-    """Backward-compatible wrapper. Ignores the playwright arg and calls check_single_court."""
-    return check_single_court(court_no, date_str, max_attempts)
-
-
-# ---------------------------
-# Parallel batch checker
-# ---------------------------
-
-def check_all_courts_parallel(
-    date_str: str,
-    courts: list = None,
-    max_workers: int = 3,
-    progress_callback=None,
-):
-    """Check multiple courts in parallel for a given date.
-
-    Args:
-        date_str: Date string YYYY-MM-DD
-        courts: List of court numbers (default 1-7)
-        max_workers: Max parallel browsers (3 is safe for Render Free 512MB)
-        progress_callback: Optional fn(court_no, status, slots_or_error) called per court
-
-    Returns:
-        dict: {court_no_str: slots_list_or_"ERROR"}
-    """
-    if courts is None:
-        courts = list(range(1, 8))
-
-    results = {}
-
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_court = {
-            executor.submit(check_single_court, court, date_str): court
-            for court in courts
-        }
-
-        for future in as_completed(future_to_court):
-            court = future_to_court[future]
-            try:
-                slots = future.result()
-                results[str(court)] = slots
-                if progress_callback:
-                    progress_callback(court, "ok", slots)
-            except Exception as e:
-                results[str(court)] = "ERROR"
-                if progress_callback:
-                    progress_callback(court, "error", str(e))
-
-    return results
-
-
-# ---------------------------
-# Manual runner
-# ---------------------------
-
-if __name__ == "__main__":
-    START_DATE = "2025-12-19"
-    END_DATE = "2025-12-19"
-
-    for date_str in daterange(START_DATE, END_DATE):
-        logger.info("\n==================== %s ====================", date_str)
-
-        def on_progress(court, status, data):
-            label = f"Wooden Court {court}"
-            if status == "ok":
-                logger.info(f"{label}: {len(data)} slots found")
-                for s in data:
-                    logger.info(f"  ✔ {s}")
-            else:
-                logger.error(f"{label}: ERROR - {data}")
-
-        results = check_all_courts_parallel(
-            date_str,
-            max_workers=3,
-            progress_callback=on_progress,
-        )
\ No newline at end of file
@@ -7,6 +7,9 @@ document.addEventListener('DOMContentLoaded', function () {
   const logsPre = document.getElementById('logs');
   const resultsDiv = document.getElementById('results');
 
+  // Must match EVENTS_PROTOCOL_VERSION in app.py
+  const PROTOCOL_VERSION = 2;
+
   let timerId = null;
   let elapsed = 0;
 
@@ -50,7 +53,7 @@ document.addEventListener('DOMContentLoaded', function () {
     checkBtn.disabled = true;
     loader.classList.remove('hidden');
     logsPre.textContent = '';
-    resultsDiv.innerHTML = '';
+    clearResults();
     startTimer();
 
     try {
@@ -73,8 +76,8 @@ document.addEventListener('DOMContentLoaded', function () {
       const eventsUrl = `/events/${jobId}`;
       const es = new EventSource(eventsUrl);
 
-      // Keep an in-memory results structure to update incrementally
-      const results = {};
+      // Frames are versioned and sequenced; stale or duplicate frames are dropped
+      let lastSeq = 0;
 
       es.onmessage = (e) => {
         if (!e.data) return;
@@ -86,28 +89,30 @@ document.addEventListener('DOMContentLoaded', function () {
           return;
         }
 
-        if (msg.type === 'log') {
-          logsPre.textContent += (logsPre.textContent ? '\n' : '') + msg.msg;
-          logsPre.scrollTop = logsPre.scrollHeight;
-        } else if (msg.type === 'result_partial') {
-          // update results partial
-          const dateStr = msg.date;
-          const courtNo = msg.court;
-          const value = msg.value;
-          if (!results[dateStr]) results[dateStr] = {};
-          results[dateStr][courtNo] = value;
-          renderResults(results);
-        } else if (msg.type === 'done') {
-          // final results
-          if (msg.results) {
-            renderResults(msg.results);
+        if (msg.type === 'error') {
+          appendLogs([`ERROR: ${msg.msg}`]);
+          return;
+        }
+        if (msg.seq === undefined) return; // keep-alive
+        if (msg.v !== PROTOCOL_VERSION) {
+          console.warn('Ignoring frame with unsupported protocol version', msg.v);
+          return;
+        }
+        if (msg.seq <= lastSeq) return;
+        lastSeq = msg.seq;
+
+        if (msg.type === 'batch') {
+          if (msg.logs && msg.logs.length) appendLogs(msg.logs);
+          for (const patch of msg.patches || []) {
+            applyPatch(patch.date, patch.court, patch.value);
           }
+        } else if (msg.type === 'done') {
+          // Reconcile against the final state in case any patch was missed
+          if (msg.results) renderResults(msg.results);
           es.close();
           stopTimer();
           loader.classList.add('hidden');
           checkBtn.disabled = false;
-        } else if (msg.type === 'error') {
-          logsPre.textContent += (logsPre.textContent ? '\n' : '') + `ERROR: ${msg.msg}`;
         }
       };
 
@@ -129,63 +134,103 @@ document.addEventListener('DOMContentLoaded', function () {
   startInput.value = today;
   endInput.value = today;
 
-  // Expose renderResults on the window to ensure it's available to event handlers
-  window.renderResults = function renderResults(results) {
-    resultsDiv.innerHTML = '';
-    for (const [date, courts] of Object.entries(results)) {
-      const dateSection = document.createElement('div');
-      dateSection.className = 'date-section';
-      const h = document.createElement('h3');
-      h.textContent = date;
-      dateSection.appendChild(h);
-
-      const table = document.createElement('div');
-      table.className = 'court-grid';
-
-      for (let i = 1; i <= 7; i++) {
-        const courtNo = String(i);
-        const cell = document.createElement('div');
-        cell.className = 'court-cell';
-        const title = document.createElement('div');
-        title.className = 'court-title';
-        title.textContent = `Court ${courtNo}`;
-        cell.appendChild(title);
-
-        const body = document.createElement('div');
-        body.className = 'court-body';
-        const value = (courts && courts[courtNo]) !== undefined ? courts[courtNo] : null;
-        if (value === 'ERROR') {
-          body.textContent = 'ERROR while checking';
-        } else if (Array.isArray(value) && value.length === 0) {
-          body.textContent = 'No available slots';
-        } else if (Array.isArray(value)) {
-          for (const slot of value) {
-            const line = document.createElement('div');
-            line.className = 'slot-line';
-            const span = document.createElement('span');
-            span.textContent = slot;
-            const btn = document.createElement('button');
-            btn.className = 'btn-small';
-            btn.textContent = 'Book';
-            btn.addEventListener('click', () => {
-              console.log('Book clicked:', { date, court: courtNo, slot });
-            });
-            line.appendChild(span);
-            line.appendChild(btn);
-            body.appendChild(line);
-          }
-        } else if (value === null) {
-          body.textContent = 'Pending...';
-        } else {
-          body.textContent = JSON.stringify(value);
-        }
+  function appendLogs(lines) {
+    const text = lines.join('\n');
+    logsPre.textContent += (logsPre.textContent ? '\n' : '') + text;
+    logsPre.scrollTop = logsPre.scrollHeight;
+  }
+
+  // date -> { grid, cells: { court -> body element } }
+  const sections = {};
 
-        cell.appendChild(body);
-        table.appendChild(cell);
+  function ensureDateSection(date) {
+    if (sections[date]) return sections[date];
+
+    const dateSection = document.createElement('div');
+    dateSection.className = 'date-section';
+    const h = document.createElement('h3');
+    h.textContent = date;
+    dateSection.appendChild(h);
+
+    const grid = document.createElement('div');
+    grid.className = 'court-grid';
+    dateSection.appendChild(grid);
+    resultsDiv.appendChild(dateSection);
+
+    sections[date] = { grid, cells: {} };
+    return sections[date];
+  }
+
+  function ensureCell(date, courtNo) {
+    const section = ensureDateSection(date);
+    if (section.cells[courtNo]) return section.cells[courtNo];
+
+    const cell = document.createElement('div');
+    cell.className = 'court-cell';
+    cell.dataset.court = courtNo;
+    const title = document.createElement('div');
+    title.className = 'court-title';
+    title.textContent = courtNo;
+    cell.appendChild(title);
+
+    const body = document.createElement('div');
+    body.className = 'court-body';
+    body.textContent = 'Pending...';
+    cell.appendChild(body);
+
+    // Keep cells ordered by court regardless of completion order
+    const before = Array.from(section.grid.children).find(
+      (el) => el.dataset.court.localeCompare(courtNo, undefined, { numeric: true }) > 0
+    );
+    section.grid.insertBefore(cell, before || null);
+
+    section.cells[courtNo] = body;
+    return body;
+  }
+
+  function applyPatch(date, courtNo, value) {
+    const body = ensureCell(date, String(courtNo));
+    body.replaceChildren();
+
+    if (value === 'ERROR') {
+      body.textContent = 'ERROR while checking';
+    } else if (Array.isArray(value) && value.length === 0) {
+      body.textContent = 'No available slots';
+    } else if (Array.isArray(value)) {
+      for (const slot of value) {
+        const line = document.createElement('div');
+        line.className = 'slot-line';
+        const span = document.createElement('span');
+        span.textContent = slot;
+        const btn = document.createElement('button');
+        btn.className = 'btn-small';
+        btn.textContent = 'Book';
+        btn.addEventListener('click', () => {
+          console.log('Book clicked:', { date, court: courtNo, slot });
+        });
+        line.appendChild(span);
+        line.appendChild(btn);
+        body.appendChild(line);
       }
+    } else if (value === null || value === undefined) {
+      body.textContent = 'Pending...';
+    } else {
+      body.textContent = JSON.stringify(value);
+    }
+  }
 
-      dateSection.appendChild(table);
-      resultsDiv.appendChild(dateSection);
+  function clearResults() {
+    resultsDiv.innerHTML = '';
+    for (const date of Object.keys(sections)) delete sections[date];
+  }
+
+  // Apply a complete results object as patches, updating cells in place
+  function renderResults(results) {
+    for (const [date, courts] of Object.entries(results)) {
+      ensureDateSection(date);
+      for (const [courtNo, value] of Object.entries(courts || {})) {
+        applyPatch(date, courtNo, value);
+      }
     }
   }
 });